@@ -1,7 +1,8 @@
 from __future__ import annotations
+import asyncio
 import inspect
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import update_wrapper
 from pathlib import Path
 from typing import Any, Callable, Generic, Iterable, Literal, Type, TypedDict, TypeVar, Unpack, cast, overload
@@ -24,7 +25,7 @@ class CheckpointerOpts(TypedDict, total=False):
   when: bool
   verbosity: Literal[0, 1]
   hash_by: Callable | None
-  should_expire: Callable[[datetime], bool] | None
+  should_expire: Callable[[datetime], bool] | timedelta | None
   capture: bool
 
 class Checkpointer:
@@ -55,7 +56,7 @@ class CheckpointFn(Generic[Fn]):
 
   def _set_ident(self, force=False):
     if not hasattr(self, "fn_hash_raw") or force:
-      self.fn_hash_raw, self.depends = get_fn_ident(unwrap_fn(self.fn), self.checkpointer.capture)
+      self.fn_hash_raw, self.depends = get_fn_ident(unwrap_fn(self.fn), self.checkpointer.capture, force)
     return self
 
   def _lazyinit(self):
@@ -69,6 +70,7 @@ class CheckpointFn(Generic[Fn]):
     self.fn_hash = str(ObjectHash().write_text(self.fn_hash_raw, iter=deep_hashes))
     self.fn_subdir = f"{fn_file}/{fn_name}/{self.fn_hash[:16]}"
     self.is_async = inspect.iscoroutinefunction(wrapped)
+    self.inflight: dict[str, asyncio.Future] = {}
     self.storage = Storage(self)
     self.cleanup = self.storage.cleanup
 
@@ -87,29 +89,51 @@ class CheckpointFn(Generic[Fn]):
     for pointfn in pointfns:
       pointfn._lazyinit()
 
-  def get_checkpoint_id(self, args: tuple, kw: dict) -> str:
+  def get_call_hash(self, args: tuple, kw: dict) -> str:
     hash_params = [self.checkpointer.hash_by(*args, **kw)] if self.checkpointer.hash_by else (args, kw)
-    call_hash = ObjectHash(self.fn_hash, *hash_params, digest_size=16)
-    return f"{self.fn_subdir}/{call_hash}"
+    return str(ObjectHash(self.fn_hash, *hash_params, digest_size=16))
+
+  def get_checkpoint_id(self, args: tuple, kw: dict) -> str:
+    return f"{self.fn_subdir}/{self.get_call_hash(args, kw)}"
 
   async def _store_on_demand(self, args: tuple, kw: dict, rerun: bool):
-    checkpoint_id = self.get_checkpoint_id(args, kw)
-    checkpoint_path = self.checkpointer.root_path / checkpoint_id
-    verbose = self.checkpointer.verbosity > 0
+    storage = self.storage
+    checkpointer = self.checkpointer
+    call_hash = self.get_call_hash(args, kw)
+    checkpoint_id = f"{self.fn_subdir}/{call_hash}"
+    checkpoint_path = storage.fn_dir / call_hash
+    verbose = checkpointer.verbosity > 0
+    inflight = self.inflight.get(checkpoint_id)
+    if inflight:
+      return await inflight
     refresh = rerun \
-      or not self.storage.exists(checkpoint_path) \
-      or (self.checkpointer.should_expire and self.checkpointer.should_expire(self.storage.checkpoint_date(checkpoint_path)))
+      or not storage.exists(checkpoint_path) \
+      or (checkpointer.should_expire is not None and storage.expired(storage.checkpoint_date(checkpoint_path)))
 
     if refresh:
       print_checkpoint(verbose, "MEMORIZING", checkpoint_id, "blue")
-      data = self.fn(*args, **kw)
-      if inspect.iscoroutine(data):
-        data = await data
-      self.storage.store(checkpoint_path, data)
-      return data
+      future = None
+      if self.is_async:
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[checkpoint_id] = future
+      try:
+        data = self.fn(*args, **kw)
+        if inspect.iscoroutine(data):
+          data = await data
+        storage.store(checkpoint_path, data)
+        if future:
+          future.set_result(data)
+        return data
+      except BaseException as ex:
+        if future:
+          future.set_exception(ex)
+          future.exception()
+        raise
+      finally:
+        self.inflight.pop(checkpoint_id, None)
 
     try:
-      data = self.storage.load(checkpoint_path)
+      data = storage.load(checkpoint_path)
       print_checkpoint(verbose, "REMEMBERED", checkpoint_id, "green")
       return data
     except (EOFError, FileNotFoundError):
@@ -124,7 +148,7 @@ class CheckpointFn(Generic[Fn]):
     return coroutine if self.is_async else sync_resolve_coroutine(coroutine)
 
   def _get(self, args, kw) -> Any:
-    checkpoint_path = self.checkpointer.root_path / self.get_checkpoint_id(args, kw)
+    checkpoint_path = self.storage.fn_dir / self.get_call_hash(args, kw)
     try:
       val = self.storage.load(checkpoint_path)
       return resolved_awaitable(val) if self.is_async else val
@@ -132,7 +156,7 @@ class CheckpointFn(Generic[Fn]):
       raise CheckpointError("Could not load checkpoint") from ex
 
   def exists(self, *args: tuple, **kw: dict) -> bool:
-    return self.storage.exists(self.checkpointer.root_path / self.get_checkpoint_id(args, kw))
+    return self.storage.exists(self.storage.fn_dir / self.get_call_hash(args, kw))
 
   __call__: Fn = cast(Fn, lambda self, *args, **kw: self._call(args, kw))
   rerun: Fn = cast(Fn, lambda self, *args, **kw: self._call(args, kw, True))
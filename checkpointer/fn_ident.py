@@ -1,15 +1,19 @@
 import dis
 import inspect
 from collections.abc import Callable
+from contextlib import suppress
 from itertools import takewhile
 from pathlib import Path
 from types import CodeType, FunctionType, MethodType
 from typing import Any, Generator, Type, TypeGuard
+from weakref import WeakKeyDictionary
 from .object_hash import ObjectHash
 from .utils import AttrDict, distinct, get_cell_contents, iterate_and_upcoming, transpose, unwrap_fn
 
 cwd = Path.cwd()
 
+ident_cache: WeakKeyDictionary[Callable, tuple[str, list[Callable]]] = WeakKeyDictionary()
+
 def is_class(obj) -> TypeGuard[Type]:
   # isinstance works too, but needlessly triggers _lazyinit()
   return issubclass(type(obj), type)
@@ -84,11 +88,20 @@ def get_depend_fns(fn: Callable, capture: bool, captured_vals_by_fn: dict[Callab
       get_depend_fns(child_fn, capture, captured_vals_by_fn)
   return captured_vals_by_fn
 
-def get_fn_ident(fn: Callable, capture: bool) -> tuple[str, list[Callable]]:
+def get_fn_ident(fn: Callable, capture: bool, force=False) -> tuple[str, list[Callable]]:
   from .checkpoint import CheckpointFn
+  cacheable = not capture
+  self_fn = fn.__func__ if isinstance(fn, MethodType) else fn
+  if cacheable and not force and fn in ident_cache:
+    fn_hash, child_depends = ident_cache[fn]
+    return fn_hash, [self_fn, *child_depends]
   captured_vals_by_fn = get_depend_fns(fn, capture)
   depends, depend_captured_vals = transpose(captured_vals_by_fn.items(), 2)
   depends = distinct(fn.__func__ if isinstance(fn, MethodType) else fn for fn in depends)
   unwrapped_depends = [fn for fn in depends if not isinstance(fn, CheckpointFn)]
   fn_hash = str(ObjectHash(fn, unwrapped_depends).update(depend_captured_vals, tolerate_errors=True))
+  if cacheable:
+    with suppress(TypeError):
+      # depends[0] is fn itself - caching it would strongly reference the weak key
+      ident_cache[fn] = (fn_hash, depends[1:])
   return fn_hash, depends
@@ -22,8 +22,14 @@ with suppress(Exception):
 def encode_type(t: type | FunctionType) -> str:
   return f"{t.__module__}:{t.__qualname__}"
 
+encoded_types: dict[type, str] = {}
+
 def encode_type_of(v: Any) -> str:
-  return encode_type(type(v))
+  t = type(v)
+  encoded = encoded_types.get(t)
+  if encoded is None:
+    encoded = encoded_types[t] = encode_type(t)
+  return encoded
 
 class ObjectHashError(Exception):
   def __init__(self, obj: Any, cause: Exception):
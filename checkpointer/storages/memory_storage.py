@@ -1,39 +1,45 @@
+import os
+import time
 from typing import Any
-from pathlib import Path
 from datetime import datetime
 from .storage import Storage
 
-item_map: dict[Path, dict[str, tuple[datetime, Any]]] = {}
-
-def get_short_path(path: Path):
-  return path.parts[-1]
+item_map: dict[str, dict[str, tuple[float, Any]]] = {}
 
 class MemoryStorage(Storage):
+  def __init__(self, checkpoint_fn):
+    super().__init__(checkpoint_fn)
+    self.fn_key = str(self.fn_dir)
+
   def get_dict(self):
-    return item_map.setdefault(self.checkpointer.root_path / self.checkpoint_fn.fn_subdir, {})
+    return item_map.setdefault(self.fn_key, {})
 
   def store(self, path, data):
-    self.get_dict()[get_short_path(path)] = (datetime.now(), data)
+    self.get_dict()[path.name] = (time.time(), data)
 
   def exists(self, path):
-    return get_short_path(path) in self.get_dict()
+    return path.name in self.get_dict()
 
   def checkpoint_date(self, path):
-    return self.get_dict()[get_short_path(path)][0]
+    return datetime.fromtimestamp(self.get_dict()[path.name][0])
 
   def load(self, path):
-    return self.get_dict()[get_short_path(path)][1]
+    return self.get_dict()[path.name][1]
 
   def delete(self, path):
-    del self.get_dict()[get_short_path(path)]
+    del self.get_dict()[path.name]
 
   def cleanup(self, invalidated=True, expired=True):
-    curr_key = self.checkpointer.root_path / self.checkpoint_fn.fn_subdir
+    curr_key = self.fn_key
+    fn_base = os.path.dirname(curr_key)
+    cutoff = self.expiry_cutoff()
+    item_expired = (lambda ts: ts < cutoff) if cutoff is not None \
+      else lambda ts: self.expired(datetime.fromtimestamp(ts))
     for key, calldict in list(item_map.items()):
-      if key.parent == curr_key.parent:
+      if os.path.dirname(key) == fn_base:
         if invalidated and key != curr_key:
           del item_map[key]
-        elif expired and self.checkpointer.should_expire:
-          for callid, (date, _) in list(calldict.items()):
-            if self.checkpointer.should_expire(date):
+        elif expired and self.checkpointer.should_expire is not None:
+          for callid, (ts, _) in list(calldict.items()):
+            if item_expired(ts):
               del calldict[callid]
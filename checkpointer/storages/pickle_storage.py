@@ -1,45 +1,161 @@
+import atexit
+import mmap
+import os
 import pickle
-import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import suppress
 from pathlib import Path
 from datetime import datetime
-from .storage import Storage
+from typing import Iterable
+from .storage import MISSING, Storage
+
+writer = ThreadPoolExecutor(max_workers=4)
+atexit.register(writer.shutdown)
 
 def get_path(path: Path):
+  return path.parent / path.name[:2] / f"{path.name[2:]}.pkl"
+
+def get_flat_path(path: Path):
   return path.with_name(f"{path.name}.pkl")
 
+def fast_rmtree(directory: Path | str):
+  for entry in os.scandir(directory):
+    if entry.is_dir(follow_symlinks=False):
+      fast_rmtree(entry.path)
+    else:
+      os.unlink(entry.path)
+  os.rmdir(directory)
+
+def scan_pkl_files(directory: Path | str) -> Iterable[os.DirEntry]:
+  try:
+    entries = os.scandir(directory)
+  except FileNotFoundError:
+    return
+  for entry in entries:
+    if entry.is_dir(follow_symlinks=False):
+      yield from scan_pkl_files(entry.path)
+    elif entry.name.endswith(".pkl"):
+      yield entry
+
 class PickleStorage(Storage):
+  def __init__(self, checkpoint_fn):
+    super().__init__(checkpoint_fn)
+    self.pending: dict[Path, Future] = {}
+    self.known: set[Path] = set()
+    self.made_dirs: set[Path] = set()
+
+  def _write(self, full_path: Path, data, prior: Future | None = None):
+    if prior is not None:
+      # serialize same-path writes; the outcome belongs to the superseded store
+      with suppress(BaseException):
+        prior.result()
+    parent = full_path.parent
+    if parent not in self.made_dirs:
+      parent.mkdir(parents=True, exist_ok=True)
+      self.made_dirs.add(parent)
+    tmp_path = full_path.with_name(full_path.name + ".tmp")
+    tmp_path.write_bytes(pickle.dumps(data, protocol=5))
+    os.replace(tmp_path, full_path)
+    self.known.add(full_path)
+
+  def _migrate_flat(self, path: Path, full_path: Path) -> bool:
+    # Checkpoints written before the sharded layout live directly in the version directory
+    flat_path = get_flat_path(path)
+    if not flat_path.exists():
+      return False
+    parent = full_path.parent
+    if parent not in self.made_dirs:
+      parent.mkdir(parents=True, exist_ok=True)
+      self.made_dirs.add(parent)
+    os.replace(flat_path, full_path)
+    return True
+
+  def _sync(self, full_path: Path):
+    future = self.pending.get(full_path)
+    if future:
+      try:
+        future.result()
+      except BaseException:
+        if self.pending.get(full_path) is future:
+          del self.pending[full_path]
+        raise
+
   def store(self, path, data):
     full_path = get_path(path)
-    full_path.parent.mkdir(parents=True, exist_ok=True)
-    with full_path.open("wb") as file:
-      pickle.dump(data, file, -1)
+    prior = self.pending.get(full_path)
+    if prior and prior.done() and (ex := prior.exception()):
+      del self.pending[full_path]
+      raise ex
+    self.memo_drop(full_path)
+    future = writer.submit(self._write, full_path, data, prior)
+    self.pending[full_path] = future
+    def discard(fut):
+      # failed writes stay pending so the next _sync or store re-raises
+      if fut.exception() is None and self.pending.get(full_path) is future:
+        del self.pending[full_path]
+    future.add_done_callback(discard)
 
   def exists(self, path):
-    return get_path(path).exists()
+    full_path = get_path(path)
+    if full_path in self.known or full_path in self.memo:
+      return True
+    self._sync(full_path)
+    if full_path.exists() or self._migrate_flat(path, full_path):
+      self.known.add(full_path)
+      return True
+    return False
 
   def checkpoint_date(self, path):
-    return datetime.fromtimestamp(get_path(path).stat().st_mtime)
+    full_path = get_path(path)
+    self._sync(full_path)
+    return datetime.fromtimestamp(full_path.stat().st_mtime)
 
   def load(self, path):
-    with get_path(path).open("rb") as file:
-      return pickle.load(file)
+    full_path = get_path(path)
+    if (data := self.memo_get(full_path)) is not MISSING:
+      return data
+    self._sync(full_path)
+    if not full_path.exists():
+      self._migrate_flat(path, full_path)
+    with full_path.open("rb") as file:
+      try:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+          data = pickle.loads(mm)
+      except ValueError:
+        data = pickle.Unpickler(file).load()
+    self.memo_set(full_path, data)
+    return data
 
   def delete(self, path):
-    get_path(path).unlink(missing_ok=True)
+    full_path = get_path(path)
+    self.memo_drop(full_path)
+    self.known.discard(full_path)
+    self._sync(full_path)
+    full_path.unlink(missing_ok=True)
+    get_flat_path(path).unlink(missing_ok=True)
 
   def cleanup(self, invalidated=True, expired=True):
-    version_path = self.checkpointer.root_path.resolve() / self.checkpoint_fn.fn_subdir
+    for full_path, future in list(self.pending.items()):
+      with suppress(BaseException):
+        future.result()
+      if self.pending.get(full_path) is future:
+        del self.pending[full_path]
+    self.known.clear()
+    self.memo.clear()
+    version_path = self.fn_dir.resolve()
     fn_path = version_path.parent
     if invalidated:
       old_dirs = [path for path in fn_path.iterdir() if path.is_dir() and path != version_path]
       for path in old_dirs:
-        shutil.rmtree(path)
+        fast_rmtree(path)
       print(f"Removed {len(old_dirs)} invalidated directories for {self.checkpoint_fn.__qualname__}")
-    if expired and self.checkpointer.should_expire:
+    if expired and self.checkpointer.should_expire is not None:
       count = 0
-      for pkl_path in fn_path.rglob("*.pkl"):
-        path = pkl_path.with_suffix("")
-        if self.checkpointer.should_expire(self.checkpoint_date(path)):
+      cutoff = self.expiry_cutoff()
+      entry_expired = (lambda mtime: mtime < cutoff) if cutoff is not None \
+        else lambda mtime: self.expired(datetime.fromtimestamp(mtime))
+      for entry in scan_pkl_files(fn_path):
+        if entry_expired(entry.stat().st_mtime):
           count += 1
-          self.delete(path)
+          os.unlink(entry.path)
       print(f"Removed {count} expired checkpoints for {self.checkpoint_fn.__qualname__}")
@@ -1,18 +1,52 @@
 from __future__ import annotations
+import time
+from collections import OrderedDict
 from typing import Any, TYPE_CHECKING
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 
 if TYPE_CHECKING:
   from ..checkpoint import Checkpointer, CheckpointFn
 
+MEMO_SIZE = 128
+MISSING = object()
+
 class Storage:
   checkpointer: Checkpointer
   checkpoint_fn: CheckpointFn
+  fn_dir: Path
 
   def __init__(self, checkpoint_fn: CheckpointFn):
     self.checkpointer = checkpoint_fn.checkpointer
     self.checkpoint_fn = checkpoint_fn
+    self.fn_dir = self.checkpointer.root_path / checkpoint_fn.fn_subdir
+    self.memo: OrderedDict[Any, Any] = OrderedDict()
+
+  def memo_get(self, key: Any) -> Any:
+    if key in self.memo:
+      self.memo.move_to_end(key)
+      return self.memo[key]
+    return MISSING
+
+  def memo_set(self, key: Any, data: Any):
+    self.memo[key] = data
+    if len(self.memo) > MEMO_SIZE:
+      self.memo.popitem(last=False)
+
+  def memo_drop(self, key: Any):
+    self.memo.pop(key, None)
+
+  def expired(self, date: datetime) -> bool:
+    should_expire = self.checkpointer.should_expire
+    if isinstance(should_expire, timedelta):
+      return datetime.now() - date > should_expire
+    return bool(should_expire and should_expire(date))
+
+  def expiry_cutoff(self) -> float | None:
+    should_expire = self.checkpointer.should_expire
+    if isinstance(should_expire, timedelta):
+      return time.time() - should_expire.total_seconds()
+    return None
 
   def store(self, path: Path, data: Any) -> None: ...
 
@@ -1,5 +1,6 @@
 import asyncio
 import pytest
+from datetime import timedelta
 from riprint import riprint as print
 from types import MethodType, MethodWrapperType
 from . import checkpoint
@@ -71,6 +72,14 @@ def test_recursive_caching2():
   with pytest.raises(CheckpointError):
     fib.get(5)
 
+def test_recursive_caching_deep():
+  @checkpoint
+  def fib(n: int) -> int:
+    return fib(n - 1) + fib(n - 2) if n > 1 else n
+
+  assert fib(30) == 832040
+  assert fib.get(30) == 832040
+
 @pytest.mark.asyncio
 async def test_async_caching():
   @checkpoint(format="memory")
@@ -83,6 +92,22 @@ async def test_async_caching():
 
   assert result1 == result2 == 9
 
+@pytest.mark.asyncio
+async def test_async_single_flight():
+  call_count = 0
+
+  @checkpoint(format="memory")
+  async def slow_square(x: int) -> int:
+    nonlocal call_count
+    call_count += 1
+    await asyncio.sleep(0.1)
+    return x ** 2
+
+  results = await asyncio.gather(slow_square(4), slow_square(4))
+
+  assert results == [16, 16]
+  assert call_count == 1
+
 def test_force_recalculation():
   @checkpoint
   def square(x: int) -> int:
@@ -92,6 +117,40 @@ def test_force_recalculation():
   square.rerun(5)
   assert square.get(5) == 25
 
+def test_rerun_updates_checkpoint():
+  calls = 0
+
+  @checkpoint(hash_by=lambda x: 0)
+  def stamped(x: int) -> tuple[int, int]:
+    nonlocal calls
+    calls += 1
+    return (x, calls)
+
+  assert stamped(1) == (1, 1)
+  assert stamped.rerun(2) == (2, 2)
+  assert stamped.get(3) == (2, 2)
+
+def test_store_failure_surfaces():
+  @checkpoint
+  def bad(x: int):
+    return lambda: x
+
+  bad(0)
+  with pytest.raises(Exception):
+    bad.exists(0)
+  assert not bad.exists(0)
+
+def test_expiry_cleanup():
+  @checkpoint(should_expire=timedelta(0))
+  def square(x: int) -> int:
+    return x ** 2
+
+  assert square(4) == 16
+  square.cleanup(invalidated=False)
+  assert not square.exists(4)
+  with pytest.raises(CheckpointError):
+    square.get(4)
+
 def test_multi_layer_decorator():
   @checkpoint(format="memory")
   @checkpoint(format="pickle")
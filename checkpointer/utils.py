@@ -1,112 +1,157 @@
 import inspect
 import tokenize
-from contextlib import contextmanager
-from io import StringIO
-from types import coroutine
+from operator import attrgetter
 from typing import Any, Callable, Coroutine, Generator, Iterable, cast
 
 def distinct[T](seq: Iterable[T]) -> list[T]:
   return list(dict.fromkeys(seq))
 
 def transpose(tuples, default_num_returns=0):
-  output = tuple(zip(*tuples))
-  if not output:
+  it = iter(tuples)
+  first = next(it, None)
+  if first is None:
     return ([],) * default_num_returns
-  return tuple(map(list, output))
+  cols = tuple([x] for x in first)
+  appends = [col.append for col in cols]
+  for row in it:
+    for append, x in zip(appends, row):
+      append(x)
+  return cols
+
+fn_body_cache: dict[tuple[str, int], str] = {}
+ignored_token_types = frozenset((tokenize.COMMENT, tokenize.NL))
 
 def get_fn_body(fn: Callable) -> str:
+  code = getattr(fn, "__code__", None)
+  key = code and (code.co_filename, code.co_firstlineno)
+  if key is not None and key in fn_body_cache:
+    return fn_body_cache[key]
   try:
     source = inspect.getsource(fn)
   except OSError:
     return ""
-  tokens = tokenize.generate_tokens(StringIO(source).readline)
-  ignore_types = (tokenize.COMMENT, tokenize.NL)
-  return "".join("\0" + token.string for token in tokens if token.type not in ignore_types)
+  lines = iter(source.splitlines(keepends=True))
+  tokens = tokenize.generate_tokens(lambda: next(lines, ""))
+  body = "".join("\0" + token.string for token in tokens if token.type not in ignored_token_types)
+  if key is not None:
+    fn_body_cache[key] = body
+  return body
 
 def get_cell_contents(fn: Callable) -> Generator[tuple[str, Any], None, None]:
-  for key, cell in zip(fn.__code__.co_freevars, fn.__closure__ or []):
+  closure = fn.__closure__
+  if not closure:
+    return
+  for i, key in enumerate(fn.__code__.co_freevars):
     try:
-      yield (key, cell.cell_contents)
+      yield (key, closure[i].cell_contents)
     except ValueError:
       pass
 
+CheckpointFn = None
+
 def unwrap_fn[T: Callable](fn: T, checkpoint_fn=False) -> T:
-  from .checkpoint import CheckpointFn
-  while True:
-    if (checkpoint_fn and isinstance(fn, CheckpointFn)) or not hasattr(fn, "__wrapped__"):
-      return cast(T, fn)
-    fn = getattr(fn, "__wrapped__")
+  global CheckpointFn
+  if CheckpointFn is None:
+    from .checkpoint import CheckpointFn
+  while not (checkpoint_fn and isinstance(fn, CheckpointFn)):
+    wrapped = getattr(fn, "__wrapped__", None)
+    if wrapped is None:
+      break
+    fn = wrapped
+  return cast(T, fn)
 
 async def resolved_awaitable[T](value: T) -> T:
   return value
 
-@coroutine
-def coroutine_as_generator[T](coroutine: Coroutine[None, None, T]) -> Generator[None, None, T]:
-  val = yield from coroutine
-  return val
-
 def sync_resolve_coroutine[T](coroutine: Coroutine[None, None, T]) -> T:
-  gen = cast(Generator, coroutine_as_generator(coroutine))
   try:
     while True:
-      next(gen)
+      coroutine.send(None)
   except StopIteration as ex:
     return ex.value
 
+attrgetter_cache: dict[tuple[str, ...], Callable] = {}
+
 class AttrDict(dict):
   def __init__(self, *args, **kwargs):
     super().__init__(*args, **kwargs)
     self.__dict__ = self
 
-  def __getattribute__(self, name: str) -> Any:
-    return super().__getattribute__(name)
-
-  def __setattr__(self, name: str, value: Any) -> None:
-    return super().__setattr__(name, value)
-
   def set(self, d: dict) -> "AttrDict":
     if not d:
       return self
-    return AttrDict({**self, **d})
+    new = AttrDict(self)
+    new.update(d)
+    return new
 
   def delete(self, *attrs: str) -> "AttrDict":
-    d = AttrDict(self)
-    for attr in attrs:
-      del d[attr]
-    return d
+    skip = set(attrs)
+    return AttrDict({k: v for k, v in self.items() if k not in skip})
 
   def get_at(self, attrs: tuple[str, ...]) -> Any:
-    d = self
-    for attr in attrs:
-      d = getattr(d, attr, None)
-    return d
+    if not attrs:
+      return self
+    getter = attrgetter_cache.get(attrs)
+    if getter is None:
+      getter = attrgetter_cache[attrs] = attrgetter(".".join(attrs))
+    try:
+      return getter(self)
+    except AttributeError:
+      return None
+
+class ContextVarScope[T]:
+  __slots__ = ("var", "value", "old")
+
+  def __init__(self, var: "ContextVar[T]", value: T):
+    self.var = var
+    self.value = value
+
+  def __enter__(self):
+    self.old = self.var.value
+    self.var.value = self.value
+
+  def __exit__(self, *exc):
+    self.var.value = self.old
 
 class ContextVar[T]:
+  __slots__ = ("value",)
+
   def __init__(self, value: T):
     self.value = value
 
-  @contextmanager
-  def set(self, value: T):
-    self.value, old = value, self.value
-    try:
-      yield
-    finally:
-      self.value = old
+  def set(self, value: T) -> ContextVarScope[T]:
+    return ContextVarScope(self, value)
+
+class tracked_iter[T]:
+  __slots__ = ("source",)
+
+  def __init__(self, source: "iterate_and_upcoming[T]"):
+    self.source = source
+
+  def __iter__(self):
+    return self
+
+  def __next__(self) -> T:
+    source = self.source
+    item = next(source.it)
+    source.peeked = item
+    source.has_peek = True
+    return item
 
 class iterate_and_upcoming[T]:
+  __slots__ = ("it", "peeked", "has_peek", "upcoming")
+
   def __init__(self, it: Iterable[T]) -> None:
     self.it = iter(it)
-    self.previous: tuple[()] | tuple[T] = ()
+    self.peeked: T | None = None
+    self.has_peek = False
+    self.upcoming = tracked_iter(self)
 
   def __iter__(self):
     return self
 
   def __next__(self) -> tuple[T, Iterable[T]]:
-    item = self.previous[0] if self.previous else next(self.it)
-    self.previous = ()
-    return item, self._tracked_iter()
-
-  def _tracked_iter(self):
-    for x in self.it:
-      self.previous = (x,)
-      yield x
+    if self.has_peek:
+      self.has_peek = False
+      return cast(T, self.peeked), self.upcoming
+    return next(self.it), self.upcoming